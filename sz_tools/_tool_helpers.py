@@ -5,24 +5,16 @@
 from __future__ import annotations
 
 import cmd
-import concurrent.futures
-import configparser
-import logging
-import math
+import functools
 import os
-import re
-import subprocess
 import sys
-import termios
 import textwrap
-import time
-import tty
 from contextlib import suppress
-from dataclasses import dataclass
+from json.encoder import encode_basestring
 from pathlib import Path
-from signal import SIGALRM, alarm, signal
-from typing import TYPE_CHECKING, Any, Dict, List, Tuple, TypeVar, Union
+from typing import TYPE_CHECKING, Any, ClassVar, Dict, List, Tuple, TypeVar, Union
 
+import orjson
 from senzing import SzEngineFlags, SzError, constants
 
 READLINE_AVAIL = False
@@ -32,18 +24,6 @@ with suppress(ImportError):
 
     READLINE_AVAIL = True
 
-
-ORJSON_AVAIL = False
-try:
-    import orjson
-
-    JsonDecodeError = orjson.JSONDecodeError
-    ORJSON_AVAIL = True
-except ImportError:
-    import json
-
-    JsonDecodeError = json.decoder.JSONDecodeError
-
 PYCLIP_AVAIL = False
 with suppress(ImportError):
     import pyclip
@@ -52,12 +32,17 @@ with suppress(ImportError):
     PYCLIP_AVAIL = True
 
 if TYPE_CHECKING:
+    import logging
+
     from .sz_command import SzCmdShell
     from .sz_configtool import SzCfgShell
 
 # TODO Change to sz when changed in builds
 CONFIG_FILE = "G2Module.ini"
 
+# Output types colorize_output accepts and the colors they map to, anything else is used as the colors
+COLOR_OUTPUT_TYPES = {"ERROR": "BAD", "WARNING": "CAUTION,ITALICS", "INFO": "HIGHLIGHT2", "SUCCESS": "GOOD"}
+
 # TODO
 TSzEngineFlags = TypeVar("TSzEngineFlags", bound="SzEngineFlags")  # pylint: disable=C0103
 
@@ -65,32 +50,27 @@ TSzEngineFlags = TypeVar("TSzEngineFlags", bound="SzEngineFlags")  # pylint: dis
 # Helper classes
 # -------------------------------------------------------------------------
 
-# -------------------------------------------------------------------------
-# Classes for custom exceptions
-# -------------------------------------------------------------------------
-
-
-class TimedOut(Exception):
-    """# TODO"""
-
-
 # -------------------------------------------------------------------------
 # Classes for handling colors
 # -------------------------------------------------------------------------
 
 
-@dataclass
 class Colors:
     """# TODO"""
 
-    AVAILABLE_THEMES = ["DEFAULT", "LIGHT", "DARK", "TERMINAL"]
+    AVAILABLE_THEMES = ("DEFAULT", "LIGHT", "DARK", "TERMINAL")
+    # Color codes built for each colors_list requested, cleared when the theme changes
+    _PREFIX_CACHE: ClassVar[Dict[str, str]] = {}
 
     @classmethod
     def apply(cls, to_color: Union[int, str], colors_list: str = "") -> Union[int, str]:
         """apply list of colors to a string"""
         # TODO colors_list is a string with multiple entries separated by ,
         if colors_list:
-            prefix = "".join([getattr(cls, i.strip().upper()) for i in colors_list.split(",")])
+            prefix = cls._PREFIX_CACHE.get(colors_list)
+            if prefix is None:
+                prefix = "".join([getattr(cls, i.strip().upper()) for i in colors_list.split(",")])
+                cls._PREFIX_CACHE[colors_list] = prefix
             return f"{prefix}{to_color}{cls.RESET}"
 
         return to_color
@@ -98,80 +78,9 @@ class Colors:
     @classmethod
     def set_theme(cls, theme: str) -> None:
         """# TODO"""
-        theme = theme.upper()
-        # best for dark backgrounds
-        if theme == "DEFAULT":
-            cls.TABLE_TITLE = cls.FG_GREY42
-            cls.ROW_TITLE = cls.FG_GREY42
-            cls.COLUMN_HEADER = cls.FG_GREY42
-            cls.ENTITY_COLOR = cls.SZ_PURPLE  # cls.FG_MEDIUMORCHID1
-            cls.DSRC_COLOR = cls.SZ_ORANGE  # cls.FG_ORANGERED1
-            cls.ATTR_COLOR = cls.SZ_BLUE  # cls.FG_CORNFLOWERBLUE
-            cls.GOOD = cls.SZ_GREEN  # cls.FG_CHARTREUSE3
-            cls.BAD = cls.SZ_RED  # cls.FG_RED3
-            cls.CAUTION = cls.SZ_YELLOW  # cls.FG_GOLD3
-            cls.DEBUG = cls.FG_MAGENTA
-            cls.HIGHLIGHT1 = cls.SZ_PINK  # cls.FG_DEEPPINK4
-            cls.HIGHLIGHT2 = cls.SZ_CYAN  # cls.FG_DEEPSKYBLUE1
-            cls.MATCH = cls.SZ_BLUE
-            cls.AMBIGUOUS = cls.SZ_LIGHTORANGE
-            cls.POSSIBLE = cls.SZ_ORANGE
-            cls.RELATED = cls.SZ_GREEN
-            cls.DISCLOSED = cls.SZ_PURPLE
-            cls.JSONKEYCOLOR = cls.SZ_BLUE
-            cls.JSONVALUECOLOR = cls.SZ_YELLOW
-        elif theme == "LIGHT":
-            cls.TABLE_TITLE = cls.FG_LIGHTBLACK
-            cls.ROW_TITLE = cls.FG_LIGHTBLACK
-            cls.COLUMN_HEADER = cls.FG_LIGHTBLACK  # + cls.ITALICS
-            cls.ENTITY_COLOR = cls.FG_LIGHTMAGENTA + cls.BOLD
-            cls.DSRC_COLOR = cls.FG_LIGHTYELLOW + cls.BOLD
-            cls.ATTR_COLOR = cls.FG_LIGHTCYAN + cls.BOLD
-            cls.GOOD = cls.FG_LIGHTGREEN
-            cls.BAD = cls.FG_LIGHTRED
-            cls.DEBUG = cls.FG_MAGENTA
-            cls.CAUTION = cls.FG_LIGHTYELLOW
-            cls.HIGHLIGHT1 = cls.FG_LIGHTMAGENTA
-            cls.HIGHLIGHT2 = cls.FG_LIGHTCYAN
-            cls.MATCH = cls.FG_LIGHTBLUE
-            cls.AMBIGUOUS = cls.FG_LIGHTYELLOW
-            cls.RELATED = cls.FG_LIGHTGREEN
-            cls.DISCLOSED = cls.FG_LIGHTMAGENTA
-            cls.JSONKEYCOLOR = cls.FG_LIGHTBLUE
-            cls.JSONVALUECOLOR = cls.FG_LIGHTYELLOW
-        elif theme == "DARK":
-            cls.TABLE_TITLE = cls.FG_BLACK
-            cls.ROW_TITLE = cls.FG_BLACK
-            cls.COLUMN_HEADER = cls.FG_BLACK  # + cls.ITALICS
-            cls.ENTITY_COLOR = cls.FG_MAGENTA
-            cls.DSRC_COLOR = cls.FG_YELLOW
-            cls.ATTR_COLOR = cls.FG_CYAN
-            cls.GOOD = cls.FG_GREEN
-            cls.BAD = cls.FG_RED
-            cls.DEBUG = cls.FG_MAGENTA
-            cls.CAUTION = cls.FG_YELLOW
-            cls.HIGHLIGHT1 = cls.FG_MAGENTA
-            cls.HIGHLIGHT2 = cls.FG_CYAN
-            cls.MATCH = cls.FG_BLUE
-            cls.AMBIGUOUS = cls.FG_YELLOW
-            cls.POSSIBLE = cls.FG_RED
-            cls.RELATED = cls.FG_GREEN
-            cls.DISCLOSED = cls.FG_MAGENTA
-            cls.JSONKEYCOLOR = cls.SZ_BLUE
-            cls.JSONVALUECOLOR = cls.SZ_YELLOW
-        # This class is mostly for sz_explorer as it has many color requirements
-        # Other tools need to do basic coloring of text, setting this theme uses
-        # the colors set by the terminal preferences so a user will see the colors
-        # they expect and set in their terminal in the output from tools
-        elif theme == "TERMINAL":
-            cls.GOOD = cls.FG_GREEN
-            cls.BAD = cls.FG_RED
-            cls.CAUTION = cls.FG_YELLOW
-            cls.DEBUG = cls.FG_MAGENTA
-            cls.HIGHLIGHT1 = cls.FG_BLUE
-            cls.HIGHLIGHT2 = cls.FG_CYAN
-            cls.JSONKEYCOLOR = cls.FG_BLUE
-            cls.JSONVALUECOLOR = cls.FG_YELLOW
+        cls._PREFIX_CACHE.clear()
+        for color_name, color in cls.THEMES.get(theme.upper(), {}).items():
+            setattr(cls, color_name, color)
 
     # Styles
     RESET = "\033[0m"
@@ -263,6 +172,87 @@ class Colors:
     SZ_RED = "\033[38;5;160m"
     SZ_YELLOW = "\033[38;5;178m"
 
+    # Colors set for each theme by set_theme
+    THEMES = {
+        # best for dark backgrounds
+        "DEFAULT": {
+            "TABLE_TITLE": FG_GREY42,
+            "ROW_TITLE": FG_GREY42,
+            "COLUMN_HEADER": FG_GREY42,
+            "ENTITY_COLOR": SZ_PURPLE,  # FG_MEDIUMORCHID1
+            "DSRC_COLOR": SZ_ORANGE,  # FG_ORANGERED1
+            "ATTR_COLOR": SZ_BLUE,  # FG_CORNFLOWERBLUE
+            "GOOD": SZ_GREEN,  # FG_CHARTREUSE3
+            "BAD": SZ_RED,  # FG_RED3
+            "CAUTION": SZ_YELLOW,  # FG_GOLD3
+            "DEBUG": FG_MAGENTA,
+            "HIGHLIGHT1": SZ_PINK,  # FG_DEEPPINK4
+            "HIGHLIGHT2": SZ_CYAN,  # FG_DEEPSKYBLUE1
+            "MATCH": SZ_BLUE,
+            "AMBIGUOUS": SZ_LIGHTORANGE,
+            "POSSIBLE": SZ_ORANGE,
+            "RELATED": SZ_GREEN,
+            "DISCLOSED": SZ_PURPLE,
+            "JSONKEYCOLOR": SZ_BLUE,
+            "JSONVALUECOLOR": SZ_YELLOW,
+        },
+        "LIGHT": {
+            "TABLE_TITLE": FG_LIGHTBLACK,
+            "ROW_TITLE": FG_LIGHTBLACK,
+            "COLUMN_HEADER": FG_LIGHTBLACK,  # + ITALICS
+            "ENTITY_COLOR": FG_LIGHTMAGENTA + BOLD,
+            "DSRC_COLOR": FG_LIGHTYELLOW + BOLD,
+            "ATTR_COLOR": FG_LIGHTCYAN + BOLD,
+            "GOOD": FG_LIGHTGREEN,
+            "BAD": FG_LIGHTRED,
+            "DEBUG": FG_MAGENTA,
+            "CAUTION": FG_LIGHTYELLOW,
+            "HIGHLIGHT1": FG_LIGHTMAGENTA,
+            "HIGHLIGHT2": FG_LIGHTCYAN,
+            "MATCH": FG_LIGHTBLUE,
+            "AMBIGUOUS": FG_LIGHTYELLOW,
+            "RELATED": FG_LIGHTGREEN,
+            "DISCLOSED": FG_LIGHTMAGENTA,
+            "JSONKEYCOLOR": FG_LIGHTBLUE,
+            "JSONVALUECOLOR": FG_LIGHTYELLOW,
+        },
+        "DARK": {
+            "TABLE_TITLE": FG_BLACK,
+            "ROW_TITLE": FG_BLACK,
+            "COLUMN_HEADER": FG_BLACK,  # + ITALICS
+            "ENTITY_COLOR": FG_MAGENTA,
+            "DSRC_COLOR": FG_YELLOW,
+            "ATTR_COLOR": FG_CYAN,
+            "GOOD": FG_GREEN,
+            "BAD": FG_RED,
+            "DEBUG": FG_MAGENTA,
+            "CAUTION": FG_YELLOW,
+            "HIGHLIGHT1": FG_MAGENTA,
+            "HIGHLIGHT2": FG_CYAN,
+            "MATCH": FG_BLUE,
+            "AMBIGUOUS": FG_YELLOW,
+            "POSSIBLE": FG_RED,
+            "RELATED": FG_GREEN,
+            "DISCLOSED": FG_MAGENTA,
+            "JSONKEYCOLOR": SZ_BLUE,
+            "JSONVALUECOLOR": SZ_YELLOW,
+        },
+        # This class is mostly for sz_explorer as it has many color requirements
+        # Other tools need to do basic coloring of text, setting this theme uses
+        # the colors set by the terminal preferences so a user will see the colors
+        # they expect and set in their terminal in the output from tools
+        "TERMINAL": {
+            "GOOD": FG_GREEN,
+            "BAD": FG_RED,
+            "CAUTION": FG_YELLOW,
+            "DEBUG": FG_MAGENTA,
+            "HIGHLIGHT1": FG_BLUE,
+            "HIGHLIGHT2": FG_CYAN,
+            "JSONKEYCOLOR": FG_BLUE,
+            "JSONVALUECOLOR": FG_YELLOW,
+        },
+    }
+
     # Set the default theme colors initially
     TABLE_TITLE = FG_GREY42
     ROW_TITLE = FG_GREY42
@@ -341,10 +331,11 @@ def get_g2module_path() -> Path:
         if root_path:
             search_paths.append(Path(root_path).joinpath("etc"))
 
+    # Only resolve candidates that exist, resolving stats each component of the path
     for path in search_paths:
-        candidate_file = path.joinpath(CONFIG_FILE).resolve()
+        candidate_file = path.joinpath(CONFIG_FILE)
         if check_file_exists(candidate_file):
-            file_paths.append(candidate_file)
+            file_paths.append(candidate_file.resolve())
 
     if len(file_paths) == 0:
         print(f"ERROR: {CONFIG_FILE} couldn't be located, searched: ")
@@ -363,37 +354,35 @@ def get_g2module_path() -> Path:
 
 def print_config_locations(locations: List[Path]) -> None:
     """# TODO"""
-    _ = [print(f"\t{loc}") for loc in locations]
-    print()
+    print("".join(f"\t{loc}\n" for loc in locations))
 
 
 def get_ini_as_json_str(ini_file: Path) -> str:
     """Return a JSON string representation of an INI file."""
-    # configparser doesn't throw an exception if file doesn't exist, test first
+    import configparser  # pylint: disable=import-outside-toplevel
+
+    # configparser doesn't throw an exception if file doesn't exist, read it here and parse the content
     try:
-        with open(ini_file, encoding="utf-8") as test:
-            _ = test.read()
+        with open(ini_file, encoding="utf-8") as ini_in:
+            ini_content = ini_in.read()
     except OSError as err:
         print_error(err)
         sys.exit(1)
 
     ini_parser = configparser.ConfigParser(empty_lines_in_values=False, interpolation=None)
-    ini_parser.read(ini_file)
-    config_dict: Dict[Any, Any] = {}
-
-    for group_name in ini_parser.sections():
-        normalized_group_name: str = group_name.upper()
-        config_dict[normalized_group_name] = {}
-        for var_name in ini_parser[group_name]:
-            normalized_var_name: str = var_name.upper()
-            config_dict[normalized_group_name][normalized_var_name] = ini_parser[group_name][var_name]
+    ini_parser.read_string(ini_content, source=str(ini_file))
+    config_dict: Dict[str, Dict[str, str]] = {
+        group_name.upper(): {var_name.upper(): value for var_name, value in section.items()}
+        for group_name, section in ini_parser.items()
+        if group_name != ini_parser.default_section
+    }
 
     # Check ini file isn't empty
     if not config_dict:
         print(f"ERROR: Successfully read {ini_file} but it appears to be empty or malformed")
         sys.exit(0)
 
-    return orjson.dumps(config_dict).decode() if ORJSON_AVAIL else json.dumps(config_dict)
+    return orjson.dumps(config_dict).decode()
 
 
 def get_engine_config(ini_file_name: Union[str, None] = None) -> str:
@@ -423,13 +412,19 @@ def get_engine_config(ini_file_name: Union[str, None] = None) -> str:
 # TODO Moved from core
 def combine_engine_flags(flags: Union[List[TSzEngineFlags], List[str]]) -> int:
     """ORs together all flags in a list of strings or engine flag members"""
-    result = constants.SZ_WITHOUT_INFO
     try:
-        for flag in flags:
-            result = result | SzEngineFlags[flag.upper()].value if isinstance(flag, str) else flag.value
+        # Normalize to a hashable key so repeated combinations of the same flags are cached
+        return _combine_engine_flags(tuple(flag.upper() if isinstance(flag, str) else flag.value for flag in flags))
     except (AttributeError, KeyError) as err:
         raise SzError(f"{err} is not a valid engine flag") from err
-    # TODO
+
+
+@functools.lru_cache(maxsize=256)
+def _combine_engine_flags(flags: Tuple[Union[int, str], ...]) -> int:
+    """ORs together normalized flag names and flag values"""
+    result = constants.SZ_WITHOUT_INFO
+    for flag in flags:
+        result |= SzEngineFlags[flag].value if isinstance(flag, str) else flag
     return result
 
 
@@ -460,14 +455,7 @@ def get_engine_flags_as_int(flags: List[str]) -> int:
 
 def check_file_exists(file_name: Union[Path, str]) -> bool:
     """# TODO"""
-
-    if isinstance(file_name, str):
-        file_name = Path(file_name)
-
-    if not file_name.is_file():
-        return False
-
-    return True
+    return os.path.isfile(file_name)
 
 
 # def check_file_readable(file_name: Union[Path, str]) -> bool:
@@ -499,20 +487,56 @@ def colorize_str(string: str, colors_list: str = "", color_disabled: bool = Fals
     return Colors.apply(string, colors_list)
 
 
-def colorize_json(json_str: str, color_disabled: bool = False) -> str:
-    """# TODO"""
-    if color_disabled:
-        return json_str
+def colorize_json_obj(json_obj: Any, format_json: bool = False) -> str:
+    """colorize an already parsed JSON document, output matches orjson.dumps() with or without OPT_INDENT_2"""
+    key_open = f'"{Colors.JSONKEYCOLOR}'
+    key_close = f'{Colors.RESET}":' + (" " if format_json else "")
+    value_open = f'"{Colors.JSONVALUECOLOR}'
+    value_close = f'{Colors.RESET}"'
+    parts: List[str] = []
+    append = parts.append
+
+    # Walk the document once emitting colored keys and string values, instead of regex passes over the JSON text.
+    # Only strings that are values of keys are colored, strings in arrays are left uncolored
+    def colorize_value(value: Any, indent: str) -> None:
+        if isinstance(value, str):
+            append(encode_basestring(value))
+        elif isinstance(value, dict):
+            if not value:
+                append("{}")
+                return
+            inner_indent = f"{indent}  " if format_json else ""
+            separator = f",\n{inner_indent}" if format_json else ","
+            append(f"{{\n{inner_indent}" if format_json else "{")
+            for i, (key, item) in enumerate(value.items()):
+                if i:
+                    append(separator)
+                append(f"{key_open}{encode_basestring(key)[1:-1]}{key_close}")
+                if isinstance(item, str):
+                    append(f"{value_open}{encode_basestring(item)[1:-1]}{value_close}")
+                else:
+                    colorize_value(item, inner_indent)
+            append(f"\n{indent}}}" if format_json else "}")
+        elif isinstance(value, list):
+            if not value:
+                append("[]")
+                return
+            inner_indent = f"{indent}  " if format_json else ""
+            separator = f",\n{inner_indent}" if format_json else ","
+            append(f"[\n{inner_indent}" if format_json else "[")
+            for i, item in enumerate(value):
+                if i:
+                    append(separator)
+                colorize_value(item, inner_indent)
+            append(f"\n{indent}]" if format_json else "]")
+        elif value is None or isinstance(value, (bool, float)):
+            append(orjson.dumps(value).decode())
+        else:
+            append(str(value))
 
-    key_replacer = rf"\1{Colors.JSONKEYCOLOR}\2{Colors.RESET}\3\4"
-    value_replacer = rf"\1\2{Colors.JSONVALUECOLOR}\3{Colors.RESET}\4\5"
-    # Look for values first to make regex a little easier to construct
-    # Regex is matching: ': "Robert Smith", ' and using the groups in the replacer to add color
-    json_color = re.sub(r"(: ?)(\")([\w\/+][^\{\"]+?)(\")(\}?|,{1}|\n)", value_replacer, json_str)
-    # Regex is matching: ': "ENTITY_ID": ' and using the groups in the replacer to add color
-    json_color = re.sub(r"(\")([\w ]*?)(\")(:{1})", key_replacer, json_color)
+    colorize_value(json_obj, "")
 
-    return json_color
+    return "".join(parts)
 
 
 # TODO - Move into Colors and add the missing values?
@@ -531,17 +555,7 @@ def colorize_output(
     output = str(output) if isinstance(output, int) else output
 
     color_or_type = color_or_type.upper()
-
-    if color_or_type == "ERROR":
-        output_type = "BAD"
-    elif color_or_type == "WARNING":
-        output_type = "CAUTION,ITALICS"
-    elif color_or_type == "INFO":
-        output_type = "HIGHLIGHT2"
-    elif color_or_type == "SUCCESS":
-        output_type = "GOOD"
-    else:
-        output_type = color_or_type
+    output_type = COLOR_OUTPUT_TYPES.get(color_or_type, color_or_type)
 
     return f"{Colors.apply(output, output_type)}"
 
@@ -555,10 +569,8 @@ def colorize_cmd_prompt(prompt: str, color_or_type: str, color_prompt: bool = Tr
     if not color_prompt:
         return f"({prompt}) "
 
-    prompt_step1 = f"\002{prompt}\001"
-    prompt_step2 = colorize_output(prompt_step1, color_or_type)
-    prompt_final = f"\001{prompt_step2}\002"
-    return f"({prompt_final}) "
+    prompt_colored = colorize_output(f"\002{prompt}\001", color_or_type)
+    return f"(\001{prompt_colored}\002) "
 
 
 # -------------------------------------------------------------------------
@@ -602,64 +614,52 @@ def print_response(
     color: str = "",
 ) -> str:
     """# TODO"""
-    strip_colors = True
-
     if not response:
         response = "No response!"
         color = "info"
 
+    # Keep the uncolored output to return and set last_response for sending to clipboard or file or
+    # reformatting JSON, rather than removing the color codes from what was printed
     if isinstance(response, int) or not response.startswith("{"):
         output = colorize_output(response, color, color_output)
+        last_response = str(response)
     else:
         try:
             # Test if data is json and format appropriately
-            _ = orjson.loads(response) if ORJSON_AVAIL else json.loads(response)
-        except (JsonDecodeError, TypeError):
+            response_json = orjson.loads(response)
+        except (orjson.JSONDecodeError, TypeError):
             output = colorize_output(response, color, color_output)
-            strip_colors = False
+            last_response = output
         else:
-            if type(response) not in [dict, list]:
-                response = orjson.loads(response) if ORJSON_AVAIL else json.loads(response)
-
             # Format JSON
-            if format_json:
-                json_ = (
-                    orjson.dumps(response, option=orjson.OPT_INDENT_2)
-                    if ORJSON_AVAIL
-                    else json.dumps(response, indent=2, ensure_ascii=False)
-                )
-            else:
-                json_: Union[bytes, str] = (  # type: ignore
-                    orjson.dumps(response) if ORJSON_AVAIL else json.dumps(response, ensure_ascii=False)
-                )
+            last_response = orjson.dumps(response_json, option=orjson.OPT_INDENT_2 if format_json else None).decode()
 
-            json_str: str = json_.decode() if ORJSON_AVAIL else json_  # type: ignore
-            output = json_str
-
-            if color_output:
-                output = colorize_json(json_str)
+            output = colorize_json_obj(response_json, format_json) if color_output else last_response
 
     if scroll_output:
+        import subprocess  # pylint: disable=import-outside-toplevel
+
         try:
-            scroll_cmd = f"echo '{output}' | less -FRSX"
-            subprocess.run([scroll_cmd], shell=True, check=True)
-        except (OSError, subprocess.CalledProcessError) as err:
+            # Pipe straight to less, a shell and echo would need the output quoted and copied through argv
+            with subprocess.Popen(["less", "-FRSX"], stdin=subprocess.PIPE) as pager:
+                pager.communicate(f"{output}\n".encode())
+        except OSError as err:
             print(f"\n{output}\n")
             print_error(f"Couldn't use paging on JSON response, calling less returned: {err}")
     else:
         print(f"\n{output}\n")
 
-    # Removing color codes, return output to set last_response for sending
-    # to clipboard or file or reformatting JSON
-    if strip_colors:
-        return re.sub(r"(\x9B|\x1B\[)[0-?]*[ -/]*[@-~]", "", output)
-
-    return output
+    return last_response
 
 
 def do_shell(self: Union[SzCmdShell, SzCfgShell], line: str) -> None:  # pylint: disable=unused-argument
     """# TODO"""
-    print(os.popen(line).read())
+    import subprocess  # pylint: disable=import-outside-toplevel
+
+    # The command writes to the terminal directly as it runs, rather than its output being held and printed after
+    sys.stdout.flush()
+    subprocess.run(line, shell=True, check=False)
+    print()
 
 
 def do_help(self: Union[SzCmdShell, SzCfgShell], help_topic: str) -> None:
@@ -695,6 +695,7 @@ def do_help(self: Union[SzCmdShell, SzCfgShell], help_topic: str) -> None:
     ]
 
     help_lines = textwrap.dedent(topic_docstring).split("\n")
+    command_name = help_topic[3:]
 
     for line in help_lines:
         line_color = ""
@@ -715,8 +716,8 @@ def do_help(self: Union[SzCmdShell, SzCfgShell], help_topic: str) -> None:
             ):
                 line_color = ""
 
-        if re.match(rf"^\s*{help_topic[3:]}", line) and not line_color:
-            sep_column = line.find(help_topic[3:]) + len(help_topic[3:])
+        if not line_color and line.lstrip().startswith(command_name):
+            sep_column = line.find(command_name) + len(command_name)
             help_text += line[0:sep_column] + colorize_str(line[sep_column:], "dim") + "\n"
         else:
             help_text += colorize_str(line, line_color) + "\n"
@@ -732,10 +733,11 @@ def do_history() -> None:
     print()
 
 
-def history_setup(module_name: str) -> Tuple[str, Path]:
-    """Attempt to setup history file"""
+def history_setup(module_name: str) -> Tuple[str, Path, int]:
+    """Attempt to setup history file, returns any error, the history file and the current history length"""
     history_error = ""
     history_file = Path(f"~/.{module_name}_history").expanduser()
+    history_length = 0
 
     if not READLINE_AVAIL:
         history_error = "History file won't be used, python readline or atexit module isn't available"
@@ -748,11 +750,27 @@ def history_setup(module_name: str) -> Tuple[str, Path]:
         except OSError as err:
             history_error = f"History file won't be used for this session: {err}"
 
-        # Read the history file and setup exit handlers to write on exit
+        # Read the history file, new entries are appended to it after each command with history_append_file. If
+        # readline can't append (some libedit builds) setup exit handlers to write on exit instead
         readline.read_history_file(history_file)
-        atexit.register(history_write_file, history_file)
+        history_length = readline.get_current_history_length()
+        if not hasattr(readline, "append_history_file"):
+            atexit.register(history_write_file, history_file)
 
-    return (history_error, history_file)
+    return (history_error, history_file, history_length)
+
+
+def history_append_file(file: Path, history_length: int) -> int:
+    """Append entries added since history_length to the history file, returns the new history length"""
+    if not READLINE_AVAIL:
+        return history_length
+
+    current_length = readline.get_current_history_length()
+    if current_length > history_length and hasattr(readline, "append_history_file"):
+        with suppress(OSError):
+            readline.append_history_file(current_length - history_length, file)
+
+    return current_length
 
 
 def history_write_file(file: Path) -> None:
@@ -805,8 +823,8 @@ def response_to_file(
     try:
         mode = "a" if append_to_file else "w"
         with open(file_path, mode, encoding="utf-8") as response_out:
-            response_file_size = Path(file_path).stat().st_size
-            if mode == "a" and response_file_size:
+            # Opening to append starts at the end of the file, the position is the existing size
+            if mode == "a" and response_out.tell():
                 response_out.write("\n")
             if add_last_command:
                 response_out.write(last_command)
@@ -833,11 +851,13 @@ def response_reformat_json(last_response: str, color_json: bool) -> str:
 # -------------------------------------------------------------------------
 
 
+@functools.lru_cache(maxsize=1)
 def get_max_futures_workers() -> int:
     """# TODO"""
-    # Test the max number of workers ThreadPoolExecutor allocates to use in sizing actual workers to request
-    with concurrent.futures.ThreadPoolExecutor() as test:
-        return test._max_workers  # pylint: disable=protected-access
+    # The default max workers ThreadPoolExecutor uses, to size the actual workers to request, without creating a
+    # pool to read it from. Python 3.13+ sizes from the CPUs the process may use rather than all CPUs
+    cpu_count = getattr(os, "process_cpu_count", os.cpu_count)()
+    return min(32, (cpu_count or 1) + 4)
 
 
 # -------------------------------------------------------------------------
@@ -850,14 +870,11 @@ def human_readable_bytes(bytes_: int) -> str:
     if bytes_ == 0:
         return "0"
 
-    factor = 1024
     magnitude = ["B", "KB", "MB", "GB", "TB"]
-    magnitude_pos = int(math.log(bytes_) / math.log(factor))
-
-    # Don't overflow!
-    magnitude_pos = min(magnitude_pos, len(magnitude) - 1)
+    # Each magnitude is 1024 (2**10) times the last, the highest bit set gives the position. Don't overflow!
+    magnitude_pos = min((bytes_.bit_length() - 1) // 10, len(magnitude) - 1)
 
-    return f"{(bytes_ / (factor**magnitude_pos)):.2f} {magnitude[magnitude_pos]}"
+    return f"{(bytes_ / (1 << (10 * magnitude_pos))):.2f} {magnitude[magnitude_pos]}"
 
 
 # -------------------------------------------------------------------------
@@ -867,6 +884,9 @@ def human_readable_bytes(bytes_: int) -> str:
 
 def get_char() -> str:
     """# TODO"""
+    import termios  # pylint: disable=import-outside-toplevel
+    import tty  # pylint: disable=import-outside-toplevel
+
     file_desc = sys.stdin.fileno()
     orig = termios.tcgetattr(file_desc)
 
@@ -879,20 +899,20 @@ def get_char() -> str:
 
 def get_char_with_timeout(time_out: int) -> str:
     """# TODO"""
+    import select  # pylint: disable=import-outside-toplevel
+    import termios  # pylint: disable=import-outside-toplevel
+    import tty  # pylint: disable=import-outside-toplevel
 
-    def handler(*_):  # type: ignore[no-untyped-def]
-        raise TimedOut
-
-    current_handler = signal(SIGALRM, handler)
-    alarm(time_out)
+    file_desc = sys.stdin.fileno()
+    orig = termios.tcgetattr(file_desc)
 
-    while True:
-        try:
-            return get_char()
-        except TimedOut:
-            return ""
-        finally:
-            signal(SIGALRM, current_handler)
+    try:
+        tty.setcbreak(file_desc)
+        # Wait for a key press to be readable instead of interrupting a blocking read with SIGALRM
+        ready, _, _ = select.select([sys.stdin], [], [], time_out)
+        return sys.stdin.read(1) if ready else ""
+    finally:
+        termios.tcsetattr(file_desc, termios.TCSAFLUSH, orig)
 
 
 # -------------------------------------------------------------------------
@@ -915,5 +935,3 @@ def startup_message(logger: logging.Logger, module_name: str, pause_time: int =
                 """
 
     # lines = [line for line in message.split("\n")]
-
-    time.sleep(1)
@@ -0,0 +1,132 @@
+import errno
+import importlib.util
+import sys
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[1] / "sz_tools" / "sz_create_project"
+
+
+def load_script(script=SCRIPT, name="sz_create_project"):
+    loader = SourceFileLoader(name, str(script))
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    assert spec is not None
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+sz_create_project = load_script()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="reflinks are only tried on Linux")
+def test_clone_file_reflink_unsupported(monkeypatch, tmp_path):
+    ioctl_calls = []
+
+    def ioctl(*args):
+        ioctl_calls.append(args)
+        raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+    monkeypatch.setattr(sz_create_project, "reflink_supported", True)
+    monkeypatch.setattr(sz_create_project.fcntl, "ioctl", ioctl)
+    for i in range(3):
+        src = tmp_path / f"src{i}"
+        src.write_text(f"file {i}")
+        sz_create_project.clone_file(src, tmp_path / f"dst{i}")
+        assert (tmp_path / f"dst{i}").read_text() == f"file {i}"
+
+    # --only the first copy tries the ioctl
+    assert len(ioctl_calls) == 1
+    assert not sz_create_project.reflink_supported
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="reflinks are only tried on Linux")
+def test_clone_file_other_error(monkeypatch, tmp_path):
+    def ioctl(*args):
+        raise OSError(errno.EIO, "Input/output error")
+
+    monkeypatch.setattr(sz_create_project, "reflink_supported", True)
+    monkeypatch.setattr(sz_create_project.fcntl, "ioctl", ioctl)
+    src = tmp_path / "src"
+    src.write_text("data")
+    sz_create_project.clone_file(src, tmp_path / "dst", metadata=False)
+    assert (tmp_path / "dst").read_text() == "data"
+    assert sz_create_project.reflink_supported
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="permissions are posix modes")
+def test_set_permissions(tmp_path):
+    project_files = [
+        "setupEnv",
+        "README",
+        "lib/g2.jar",
+        "lib/libSz.so",
+        "bin/sz_command",
+        "resources/templates/setupEnv",
+    ]
+    for name in project_files:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).touch()
+        (tmp_path / name).chmod(0o644)
+
+    sz_create_project.set_permissions(tmp_path)
+
+    modes = {name: (tmp_path / name).stat().st_mode & 0o777 for name in project_files}
+    assert modes == {
+        "setupEnv": 0o770,
+        "README": 0o660,
+        "lib/g2.jar": 0o644,
+        "lib/libSz.so": 0o660,
+        "bin/sz_command": 0o770,
+        "resources/templates/setupEnv": 0o770,
+    }
+    assert (tmp_path / "resources" / "templates").stat().st_mode & 0o777 == 0o770
+
+
+@pytest.fixture(name="fake_install")
+def fixture_fake_install(tmp_path, monkeypatch):
+    """A minimal Senzing install with a copy of sz_create_project in its bin folder, returns its create_project main"""
+    install_files = {
+        "er/szBuildVersion.json": '{"BUILD_VERSION": "4.0.0.00000"}',
+        "er/setupEnv": "install setupEnv",
+        "er/lib/g2.jar": "",
+        "er/resources/templates/setupEnv": "export SENZING_ROOT=${SENZING_DIR}",
+        "er/resources/templates/G2Module.ini": "CONFIGPATH=${SENZING_CONFIG_PATH}",
+        "er/resources/templates/G2C.db": "sqlite",
+        "er/resources/templates/cfgVariant.json": "{}",
+        "data/libpostal/data": "",
+    }
+    for name, contents in install_files.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(contents)
+    (tmp_path / "er" / "bin").mkdir()
+    script = tmp_path / "er" / "bin" / "sz_create_project"
+    script.write_bytes(SCRIPT.read_bytes())
+
+    monkeypatch.setattr(sys, "argv", ["sz_create_project", str(tmp_path / "project")])
+    return tmp_path, load_script(script, "fake_install_sz_create_project").main
+
+
+def test_create_project(fake_install):
+    root, create_project = fake_install
+    create_project()
+    project = root / "project"
+    # --the template setupEnv always replaces the one copied with the install tree
+    assert (project / "setupEnv").read_text() == f"export SENZING_ROOT={project}"
+    assert (project / "etc" / "G2Module.ini").read_text() == f"CONFIGPATH={project / 'etc'}"
+    assert (project / "etc" / "cfgVariant.json").exists()
+    assert not (project / "etc" / "setupEnv").exists()
+    assert (project / "var" / "sqlite" / "G2C.db").read_text() == "sqlite"
+    assert (project / "data" / "libpostal" / "data").exists()
+    assert (project / "lib" / "g2.jar").exists()
+    assert not (project / "bin" / "sz_create_project").exists()
+
+
+def test_create_project_overlap(fake_install):
+    root, create_project = fake_install
+    (root / "er" / "etc").mkdir()
+    with pytest.raises(FileExistsError):
+        create_project()
+    assert not (root / "project").exists()
@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import threading
+
+import _tool_helpers
+import orjson
+import pytest
+from _tool_helpers import (
+    Colors,
+    colorize_json_obj,
+    combine_engine_flags,
+    get_char_with_timeout,
+    history_append_file,
+    print_response,
+)
+from senzing import SzEngineFlags, SzError
+
+ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+@pytest.fixture(name="readline")
+def fixture_readline():
+    readline = pytest.importorskip("readline")
+    if not hasattr(readline, "append_history_file"):
+        pytest.skip("readline can't append to a history file")
+    readline.clear_history()
+    yield readline
+    readline.clear_history()
+
+
+def test_history_append_file_no_readline(monkeypatch, tmp_path):
+    monkeypatch.setattr(_tool_helpers, "READLINE_AVAIL", False)
+    monkeypatch.delattr(_tool_helpers, "readline", raising=False)
+    history_file = tmp_path / "history"
+    assert history_append_file(history_file, 3) == 3
+    assert not history_file.exists()
+
+
+def test_history_append_file(readline, tmp_path):
+    history_file = tmp_path / "history"
+    history_file.touch()
+    readline.add_history("get_entity_by_entity_id 1")
+    assert history_append_file(history_file, 0) == 1
+    readline.add_history("get_entity_by_entity_id 2")
+    readline.add_history("why_entities 1 2")
+    assert history_append_file(history_file, 1) == 3
+    # --nothing new since the last append
+    assert history_append_file(history_file, 3) == 3
+
+    readline.clear_history()
+    readline.read_history_file(history_file)
+    assert [readline.get_history_item(i) for i in range(1, readline.get_current_history_length() + 1)] == [
+        "get_entity_by_entity_id 1",
+        "get_entity_by_entity_id 2",
+        "why_entities 1 2",
+    ]
+
+
+@pytest.mark.parametrize("format_json", [False, True])
+def test_print_response_json_no_color(capsys, format_json):
+    response = '{"RESOLVED_ENTITY": {"ENTITY_ID": 1, "ENTITY_NAME": "Robert Smith"}}'
+    expected = (
+        '{\n  "RESOLVED_ENTITY": {\n    "ENTITY_ID": 1,\n    "ENTITY_NAME": "Robert Smith"\n  }\n}'
+        if format_json
+        else '{"RESOLVED_ENTITY":{"ENTITY_ID":1,"ENTITY_NAME":"Robert Smith"}}'
+    )
+    assert print_response(response, format_json=format_json, color_output=False) == expected
+    assert capsys.readouterr().out == f"\n{expected}\n\n"
+
+
+@pytest.mark.parametrize("format_json", [False, True])
+def test_colorize_json_obj(format_json):
+    Colors.set_theme("DEFAULT")
+    json_obj = {
+        "RESOLVED_ENTITY": {
+            "ENTITY_ID": 1,
+            "ENTITY_NAME": 'Robert "Bob" Smith\n',
+            "FEATURES": {"NAME": [{"FEAT_DESC": "Robert Smith", "LIB_FEAT_ID": 1}], "EMPTY": []},
+            "DATA_SOURCES": ["CUSTOMERS", "WATCHLIST"],
+            "IS_AMBIGUOUS": False,
+            "SCORE": 99.5,
+            "RECORDS": None,
+        }
+    }
+    colored = colorize_json_obj(json_obj, format_json)
+    assert (
+        ANSI_RE.sub("", colored) == orjson.dumps(json_obj, option=orjson.OPT_INDENT_2 if format_json else None).decode()
+    )
+
+    space = " " if format_json else ""
+    assert f'"{Colors.JSONKEYCOLOR}ENTITY_NAME{Colors.RESET}":{space}"{Colors.JSONVALUECOLOR}Robert' in colored
+    # --only values of keys are colored, strings in arrays aren't
+    assert f"{Colors.JSONVALUECOLOR}CUSTOMERS" not in colored
+
+
+def test_combine_engine_flags():
+    expected = SzEngineFlags.SZ_ENTITY_INCLUDE_RECORD_DATA.value | SzEngineFlags.SZ_ENTITY_INCLUDE_ENTITY_NAME.value
+    assert combine_engine_flags(["SZ_ENTITY_INCLUDE_RECORD_DATA", "sz_entity_include_entity_name"]) == expected
+    # --a member following a name is ORed in, not swapped in for the result so far
+    assert (
+        combine_engine_flags(["SZ_ENTITY_INCLUDE_RECORD_DATA", SzEngineFlags.SZ_ENTITY_INCLUDE_ENTITY_NAME]) == expected
+    )
+    assert (
+        combine_engine_flags([SzEngineFlags.SZ_ENTITY_INCLUDE_ENTITY_NAME, "SZ_ENTITY_INCLUDE_RECORD_DATA"]) == expected
+    )
+    assert combine_engine_flags([]) == 0
+
+
+def test_combine_engine_flags_invalid():
+    with pytest.raises(SzError, match="SZ_NOT_A_FLAG"):
+        combine_engine_flags(["SZ_ENTITY_INCLUDE_RECORD_DATA", "sz_not_a_flag"])
+
+
+@pytest.fixture(name="tty_stdin")
+def fixture_tty_stdin(monkeypatch):
+    pty = pytest.importorskip("pty")
+    termios = pytest.importorskip("termios")
+    main_fd, replica_fd = pty.openpty()
+    with open(replica_fd, encoding="utf-8") as replica:
+        monkeypatch.setattr(sys, "stdin", replica)
+        orig = termios.tcgetattr(replica_fd)
+        yield main_fd
+        # --the terminal settings are put back whether or not a key was pressed
+        assert termios.tcgetattr(replica_fd) == orig
+    os.close(main_fd)
+
+
+def test_get_char_with_timeout(tty_stdin):
+    # --press the key once get_char_with_timeout is waiting, setting cbreak mode flushes earlier input
+    key_press = threading.Timer(0.2, os.write, (tty_stdin, b"y"))
+    key_press.start()
+    assert get_char_with_timeout(5) == "y"
+    key_press.join()
+
+
+@pytest.mark.usefixtures("tty_stdin")
+def test_get_char_with_timeout_no_key():
+    assert get_char_with_timeout(0) == ""